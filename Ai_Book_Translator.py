@@ -1,18 +1,72 @@
 import re
 import json
+import asyncio
+import hashlib
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 import time
 import getpass
 import sys
 import os
 
-# --- Book Object Model (Single Class) ---
+try:
+    # Optional: orjson serializes large books much faster than the json module
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # The Batch API is only exposed by the newer google-genai SDK; it is optional
+    from google import genai as batch_genai
+except ImportError:
+    batch_genai = None
+
+# --- Concurrency & Rate Limit Settings ---
+MAX_CONCURRENT_REQUESTS = 10  # Maximum number of Gemini requests in flight at once (also the thread pool size)
+REQUESTS_PER_MINUTE = 60  # Request budget enforced by the rate limiter
+MAX_RETRIES = 5  # Attempts per heading/paragraph before giving up
+RETRY_MIN_WAIT = 1  # Shortest backoff (seconds) before retrying a failed request
+RETRY_MAX_WAIT = 30  # Longest backoff (seconds) before retrying a failed request
+MAX_INPUT_CHARS = 4000  # Paragraph characters packed into a single translation request
+MAX_PARAGRAPHS_PER_REQUEST = 20  # Upper bound on paragraphs packed into a single request
+OUTPUT_BUFFER_SIZE = 1 << 20  # Write buffer (bytes) for the text output files
+BATCH_POLL_INTERVAL = 30  # Seconds between Batch API job status checks
+BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED",
+                     "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+# Numbered paragraph in a packed translation response, e.g. "[2] Translated text"
+_NUMBERED_TRANSLATION_RE = re.compile(r"\[(\d+)\]\s*(.+?)(?=\n\s*\[\d+\]|\Z)", re.S)
+
+
+# --- Book Object Model ---
+class Paragraph:
+    """
+    A single original paragraph and its translation.
+    Uses __slots__ since a book holds one of these per paragraph, which keeps each
+    instance much smaller than an equivalent dictionary.
+    """
+
+    __slots__ = ('original', 'translated')
+
+    def __init__(self, original, translated):
+        self.original = original
+        self.translated = translated
+
+    def to_dict(self):
+        """Returns the paragraph in its JSON form: {'original': '...', 'translated': '...'}."""
+        return {'original': self.original, 'translated': self.translated}
+
+    def __repr__(self):
+        return f"Paragraph(original={self.original!r}, translated={self.translated!r})"
+
+
 class Book:
     """
     Represents the entire book, managing chapters and paragraphs internally
     using a list of dictionaries.
     Each item in 'content' list is a chapter dictionary:
-    {'title': 'Chapter Name', 'paragraphs': [{'original': '...', 'translated': '...'}]}
+    {'title': 'Chapter Name', 'paragraphs': [Paragraph('...', '...')]}
     """
 
     def __init__(self, title="Translated Book"):
@@ -34,15 +88,127 @@ class Book:
             raise ValueError("Cannot add paragraph: No chapter has been added to the book yet.")
 
         last_chapter = self.content[-1]
-        paragraph_dict = {'original': original_text, 'translated': translated_text}
-        last_chapter['paragraphs'].append(paragraph_dict)
+        last_chapter['paragraphs'].append(Paragraph(original_text, translated_text))
 
     def __repr__(self):
         return f"Book(title='{self.title}', chapters_count={len(self.content)})"
 
 
+class RateLimiter:
+    """
+    Token bucket rate limiter for asyncio code.
+    Allows at most 'max_rate' acquisitions per 'time_period' seconds, refilling continuously,
+    and is used as an async context manager around each API call.
+    """
+
+    def __init__(self, max_rate, time_period=60):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = max_rate
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and consumes it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                refill = (now - self._last_refill) * self.max_rate / self.time_period
+                self._tokens = min(self.max_rate, self._tokens + refill)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # Sleep just long enough for the next token to become available
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class TranslationCache:
+    """
+    Persistent cache of paragraph and heading translations backed by a SQLite file.
+    Entries are keyed by a SHA-256 hash of the kind of text, target language, tone and source
+    text, so text that repeats (within a book or across runs) is only sent to Gemini once.
+    """
+
+    def __init__(self, filename, target_language, tone):
+        self.target_language = target_language
+        self.tone = tone
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, translated TEXT NOT NULL)")
+
+    def make_key(self, text, kind="paragraph"):
+        """
+        Returns the cache key for a source text under the current language and tone.
+        'kind' ("paragraph" or "heading") keeps translations made with different prompts apart.
+        """
+        key = f"{kind}|{self.target_language}|{self.tone}|{text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, text, kind="paragraph"):
+        """Returns the cached translation of text, or None on a cache miss."""
+        row = self.connection.execute(
+            "SELECT translated FROM translations WHERE key = ?", (self.make_key(text, kind),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, text, translated_text, kind="paragraph"):
+        """Stores the translation of text, replacing any previous entry."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO translations (key, translated) VALUES (?, ?)",
+                (self.make_key(text, kind), translated_text))
+
+    def close(self):
+        self.connection.close()
+
+
 # --- Original API & Utility Functions ---
 
+MODEL_NAME = "models/gemini-1.5-flash"
+
+_configured_key = None  # API key the Gemini SDK is currently configured with
+_test_model = None  # Model reused by check_api_key while the configured key is unchanged
+
+
+def configure_gemini(api_key):
+    """
+    Configures the Gemini SDK with api_key, skipping the call when that key is already set.
+    genai.configure discards the SDK's cached clients, so repeating it reopens connections.
+    """
+    global _configured_key, _test_model
+    if api_key == _configured_key:
+        return
+    genai.configure(api_key=api_key)
+    _configured_key = api_key
+    _test_model = None  # A model keeps the client it first used, so don't reuse it across keys
+
+
+def build_system_instruction(target_language, tone):
+    """
+    Returns the system instruction used for every translation request,
+    shared by the regular model and Batch API requests.
+    """
+    return f"""You are an AI specialized in translating books.
+        Translate all text into {target_language}.
+        Maintain a {tone} tone throughout the translation.
+        Use words that are simple to understand with modern and formal diction (avoid slang or gen-z terms).
+        Ensure readers are engaged.
+        Crucially, only produce the translated text, without any additional commentary, introductions, or conclusions."""
+
+
+def paragraph_prompt(text):
+    """Returns the user prompt used to translate a single paragraph."""
+    return f"Translate the following paragraph. Text: {text}"
+
+
 def setup_gemini(api_key, target_language, tone):
     """
     Configures the Gemini API with the given API key and returns the model.
@@ -50,17 +216,17 @@ def setup_gemini(api_key, target_language, tone):
     Exits if the model cannot be set up.
     """
     try:
-        genai.configure(api_key=api_key)
+        configure_gemini(api_key)
         # Define the system instruction for the model
-        system_instruction_prompt = f"""You are an AI specialized in translating books.
-        Translate all text into {target_language}.
-        Maintain a {tone} tone throughout the translation.
-        Use words that are simple to understand with modern and formal diction (avoid slang or gen-z terms).
-        Ensure readers are engaged.
-        Crucially, only produce the translated text, without any additional commentary, introductions, or conclusions."""
+        system_instruction_prompt = build_system_instruction(target_language, tone)
 
+        # This single model must be reused for every request: it keeps its gRPC clients, which
+        # hold long-lived multiplexed channels (sync calls share the SDK's cached client, and the
+        # async client is created once, on the event loop started by asyncio.run in __main__).
+        # gRPC is already the SDK's default transport; passing transport="grpc" to configure
+        # would also be applied to the async client, which needs "grpc_asyncio", so it is left unset.
         model = genai.GenerativeModel(
-            "models/gemini-1.5-flash",
+            MODEL_NAME,
             system_instruction=system_instruction_prompt
         )
         return model
@@ -68,45 +234,128 @@ def setup_gemini(api_key, target_language, tone):
         sys.exit(f"MODEL CAN NOT BE SET UP. Please check your API key or network connection. Error: {e}")
 
 
-def translate_block(model, text):
+async def generate_content(model, prompt):
     """
-    Translates a single block of text using the Gemini model.
+    Sends a prompt to the model and returns the response.
+    Uses the SDK's async API when available; otherwise the blocking call runs in the
+    event loop's thread pool, which still overlaps requests since threads release the
+    GIL while waiting on the network.
+    """
+    if hasattr(model, "generate_content_async"):
+        return await model.generate_content_async([prompt])
+    return await asyncio.to_thread(model.generate_content, [prompt])
+
+
+async def translate_block(model, text):
+    """
+    Translates a single block of text using the Gemini model without blocking the event loop.
     The language and tone are set via system instructions.
     Raises ValueError if translation fails.
     """
-    prompt = f"Translate the following paragraph. Text: {text}"
+    prompt = paragraph_prompt(text)
     try:
-        response = model.generate_content([prompt])
+        response = await generate_content(model, prompt)
         return response.text.strip()
     except Exception as e:
         print(f"❌ Error during translation: {e}")
         raise ValueError("Unable to translate block.")
 
-def translate_heading(model, text):
+async def translate_heading(model, text):
     """
-    Translates a single heading/index using the Gemini model.
+    Translates a single heading/index using the Gemini model without blocking the event loop.
     The language and tone are set via system instructions.
     Raises ValueError if translation fails.
     """
     prompt = f"Translate the following chapter title or section heading. Title/Heading: {text}"
     try:
-        response = model.generate_content([prompt])
+        response = await generate_content(model, prompt)
         return response.text.strip()
     except Exception as e:
         print(f"❌ Error during heading translation: {e}")
         raise ValueError("Unable to translate heading.")
 
 
+async def translate_packed_blocks(model, texts):
+    """
+    Translates several paragraphs with a single request by numbering them in the prompt.
+    Returns the translations in order, or None if the response does not contain exactly
+    one numbered translation per paragraph.
+    Raises ValueError if the request fails.
+    """
+    numbered_paragraphs = "\n\n".join(f"[{num}] {text}" for num, text in enumerate(texts, 1))
+    prompt = ("Translate each numbered paragraph. Return ONLY the translations in the same numbered format."
+              f"\n\n{numbered_paragraphs}")
+    try:
+        response = await generate_content(model, prompt)
+        output = response.text
+    except Exception as e:
+        print(f"❌ Error during translation: {e}")
+        raise ValueError("Unable to translate blocks.")
+    matches = _NUMBERED_TRANSLATION_RE.findall(output)
+    if [int(num) for num, _ in matches] != list(range(1, len(texts) + 1)):
+        return None
+    return [translation.strip() for _, translation in matches]
+
+
+def pack_paragraphs(texts, max_chars=MAX_INPUT_CHARS, max_count=MAX_PARAGRAPHS_PER_REQUEST):
+    """
+    Splits texts into consecutive groups of at most max_count paragraphs whose combined
+    length stays within max_chars. A paragraph longer than max_chars is put in a group of its own.
+    """
+    groups = []
+    group, group_chars = [], 0
+    for text in texts:
+        if group and (group_chars + len(text) > max_chars or len(group) == max_count):
+            groups.append(group)
+            group, group_chars = [], 0
+        group.append(text)
+        group_chars += len(text)
+    if group:
+        groups.append(group)
+    return groups
+
+
+def backoff_delay(attempt):
+    """
+    Returns a randomized wait (seconds) before retry number 'attempt'.
+    The upper bound doubles with each attempt, capped at RETRY_MAX_WAIT, and the jitter
+    keeps concurrent requests that failed together from retrying in lockstep.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_WAIT, RETRY_MIN_WAIT * 2 ** attempt))
+    return max(RETRY_MIN_WAIT, delay)
+
+
+async def translate_with_retries(translate_fn, model, text, label, semaphore, limiter):
+    """
+    Runs translate_fn (translate_block or translate_heading) for a single text,
+    bounded by the shared semaphore and rate limiter, retrying on failure
+    with exponential backoff and random jitter.
+    Raises ValueError once MAX_RETRIES attempts have failed.
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        async with semaphore, limiter:
+            try:
+                return await translate_fn(model, text)
+            except ValueError:
+                print(f"    Failed to translate {label}. Retrying ({attempt}/{MAX_RETRIES})...")
+        if attempt < MAX_RETRIES:
+            await asyncio.sleep(backoff_delay(attempt))
+    print(f"❌ Giving up on {label} after {MAX_RETRIES} attempts.")
+    raise ValueError(f"Unable to translate {label}.")
+
+
 def check_api_key(api_key):
     """
     Validates the Gemini API key by making a test call.
     Returns True if the key is invalid, False otherwise.
     """
+    global _test_model
     try:
-        genai.configure(api_key=api_key)
-        # Use a minimal system instruction for the check
-        test_model = genai.GenerativeModel("models/gemini-1.5-flash", system_instruction="Respond concisely.")
-        response = test_model.generate_content("Hello Gemini")
+        configure_gemini(api_key)
+        if _test_model is None:
+            # Use a minimal system instruction for the check
+            _test_model = genai.GenerativeModel(MODEL_NAME, system_instruction="Respond concisely.")
+        response = _test_model.generate_content("Hello Gemini")
         print("✅ API Key is valid.")
         print("🔹 Test Response:", response.text.strip())
         return False  # Key is valid
@@ -118,34 +367,42 @@ def check_api_key(api_key):
 
 def convert_txt_to_dict(txtfile):
     """
-    Reads a text file, parses it into a dictionary where keys are chapter/summary headings
-    and values are lists of original paragraphs. This function remains as in your original code.
+    Reads a text file, parses it into an ordered list of (heading, paragraphs) tuples,
+    one per chapter/summary section, streaming the file line by line.
     Exits if the text file format is not as expected.
     """
     try:
-        with open(txtfile, "r", encoding="utf-8") as file:
-            content = file.read().strip()
-        paragraphs = content.split("\n\n")
-        blocks = []
-        for para in paragraphs:
-            clean = para.strip()
-            if clean:
-                blocks.append(clean)
-        chapter = {}
         # Default for initial blocks before any chapter number
-        number = "summary"
-        chapter["summary"] = []
-        for block in blocks:
+        paragraphs = []
+        chapters = [("summary", paragraphs)]
+        lines = []  # Lines (with their newlines) of the block currently being read
+
+        def flush_block():
+            nonlocal paragraphs
+            if not lines:
+                return  # Consecutive blank lines
+            block = "".join(lines).strip()
+            lines.clear()
             if len(block) < 3:
-                continue
-            # Regex to match chapter numbers like "{-Chapter Name-}"
-            match = re.match(r"^\{-(.+)-\}$", block)
-            if match:
-                number = match.group(1)
+                return
+            # Chapter numbers are single-line blocks like "{-Chapter Name-}"
+            if len(block) > 4 and block.startswith("{-") and block.endswith("-}") and "\n" not in block:
+                paragraphs = []
+                chapters.append((block[2:-2], paragraphs))
             else:
-                chapter.setdefault(number, []).append(block)
+                paragraphs.append(block)
+
+        # Stream the file so only the current block is held in memory
+        with open(txtfile, "r", encoding="utf-8") as file:
+            for line in file:
+                # isspace() spots blank lines without building a stripped copy of every line
+                if line.isspace():
+                    flush_block()  # A blank line ends the current block
+                else:
+                    lines.append(line)
+        flush_block()
 
-        return chapter
+        return chapters
 
     except FileNotFoundError:
         sys.exit(f"Error: Input text file '{txtfile}' not found. Please ensure it exists in the correct directory.")
@@ -153,26 +410,356 @@ def convert_txt_to_dict(txtfile):
         sys.exit(f"Error parsing text file. Please arrange text file as specified in README. Error: {e}")
 
 
-def save_dict_to_json(data, filename="book.json"):
+def flatten_book_blocks(chapters):
+    """
+    Flattens the parsed book into a list of (chapter_idx, paragraph_idx, text) tuples.
+    The index pair is a stable key used to join translations back to their paragraph.
+    """
+    return [
+        (chap_id, para_id, text)
+        for chap_id, (_, paragraphs) in enumerate(chapters)
+        for para_id, text in enumerate(paragraphs)
+    ]
+
+
+def write_batch_requests(blocks, system_instruction, filename):
+    """
+    Writes a JSONL Batch API request file with one request per paragraph block.
+    Each request is keyed by '<chapter_idx>-<paragraph_idx>'.
+    """
+    with open(filename, "w", encoding="utf-8") as f:
+        for chap_id, para_id, text in blocks:
+            request = {
+                "key": f"{chap_id}-{para_id}",
+                "request": {
+                    "system_instruction": {"parts": [{"text": system_instruction}]},
+                    "contents": [{"role": "user", "parts": [{"text": paragraph_prompt(text)}]}],
+                },
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+
+def parse_batch_results(output):
+    """
+    Parses the JSONL output of a Batch API job into a dictionary mapping
+    (chapter_idx, paragraph_idx) to translated text. Failed requests are left out.
     """
-    Saves a dictionary (like the one returned by convert_txt_to_dict) to a JSON file.
+    translations = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        try:
+            parts = record["response"]["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError, TypeError):
+            continue  # Errored request; it will be translated with a regular request instead
+        translated = "".join(part.get("text", "") for part in parts).strip()
+        if translated:
+            chap_id, para_id = (int(value) for value in record["key"].split("-"))
+            translations[(chap_id, para_id)] = translated
+    return translations
+
+
+async def translate_blocks_with_batch(api_key, system_instruction, blocks, requests_filename):
     """
+    Submits all paragraph blocks as a single Gemini Batch API job and waits for it to finish.
+    The blocking SDK calls run in worker threads while the waiting is done on the event loop,
+    so an interrupted run stops polling at once.
+    Returns a dictionary mapping (chapter_idx, paragraph_idx) to translated text,
+    or None if the Batch API is unavailable or the job fails, so the caller can fall back.
+    """
+    if not blocks:
+        return {}  # Everything is already translated; don't submit an empty job
+    if batch_genai is None:
+        print("❌ The Batch API requires the 'google-genai' package. Using regular requests instead.")
+        return None
     try:
+        client = batch_genai.Client(api_key=api_key)
+        write_batch_requests(blocks, system_instruction, requests_filename)
+        uploaded_file = await asyncio.to_thread(
+            client.files.upload,
+            file=requests_filename,
+            config={"display_name": os.path.basename(requests_filename), "mime_type": "jsonl"},
+        )
+        job = await asyncio.to_thread(
+            client.batches.create,
+            model=MODEL_NAME,
+            src=uploaded_file.name,
+            config={"display_name": os.path.basename(requests_filename)},
+        )
+        print(f"Batch job '{job.name}' submitted with {len(blocks)} paragraphs. Waiting for it to finish...")
+        while job.state.name not in BATCH_DONE_STATES:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            job = await asyncio.to_thread(client.batches.get, name=job.name)
+            print(f"  Batch job state: {job.state.name}")
+
+        if job.state.name not in ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"):
+            print(f"❌ Batch job finished with state {job.state.name}. Using regular requests instead.")
+            return None
+        output = await asyncio.to_thread(client.files.download, file=job.dest.file_name)
+        translations = parse_batch_results(output.decode("utf-8"))
+        print(f"✅ Batch job translated {len(translations)} of {len(blocks)} paragraphs.")
+        return translations
+    except Exception as e:
+        print(f"❌ Batch translation failed: {e}. Using regular requests instead.")
+        return None
+
+
+def json_separators(indent):
+    """Returns json.dump separators: compact when not indenting, the usual ones otherwise."""
+    return (",", ":") if indent is None else (",", ": ")
+
+
+def json_default(obj):
+    """Converts objects the JSON encoders don't know about (Paragraph) into JSON-ready values."""
+    if isinstance(obj, Paragraph):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def write_json_file(data, filename, indent=None):
+    """
+    Writes data to a UTF-8 JSON file, compact unless an indent is given.
+    Uses orjson when it is installed (which only indents by 2 spaces), the json module otherwise.
+    """
+    if orjson is not None:
+        with open(filename, "wb") as f:
+            f.write(orjson.dumps(data, default=json_default, option=orjson.OPT_INDENT_2 if indent else 0))
+    else:
         with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            json.dump(data, f, ensure_ascii=False, indent=indent, separators=json_separators(indent),
+                      default=json_default)
+
+
+def checkpoint_record(chap_id, para_id, original_text, translated_text):
+    """Returns one checkpoint line; para_id is None for a chapter heading."""
+    record = {'chap': chap_id, 'para': para_id, 'original': original_text, 'translated': translated_text}
+    if orjson is not None:
+        return orjson.dumps(record).decode("utf-8") + "\n"
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def write_checkpoint_records(checkpoint_file, chap_id, para_ids, original_text, translated_text):
+    """Appends one checkpoint record per para_id and flushes them so they survive an interruption."""
+    checkpoint_file.writelines(checkpoint_record(chap_id, para_id, original_text, translated_text)
+                               for para_id in para_ids)
+    checkpoint_file.flush()
+
+
+def open_checkpoint(filename, target_language, tone, resume):
+    """
+    Opens the checkpoint file for appending translations as they complete.
+    Unless resuming, the file is started over with a header line recording the
+    language and tone it was written for. When resuming after a line was cut off
+    mid-write, a newline is added first so the next record starts on its own line.
+    """
+    if resume:
+        torn = False
+        with open(filename, "rb") as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        checkpoint_file = open(filename, "a", encoding="utf-8")
+        if torn:
+            checkpoint_file.write("\n")
+        return checkpoint_file
+    checkpoint_file = open(filename, "w", encoding="utf-8")
+    checkpoint_file.write(json.dumps({'language': target_language, 'tone': tone}, ensure_ascii=False) + "\n")
+    return checkpoint_file
+
+
+def load_checkpoint(filename, chapters, target_language, tone):
+    """
+    Loads translations recorded by an earlier run from a checkpoint file.
+    Returns a dictionary mapping (chapter_idx, paragraph_idx) to translated text, with
+    paragraph_idx None for chapter headings. Entries whose original text no longer matches
+    the parsed chapters are dropped, and nothing is loaded if the file is missing or was
+    written for a different language or tone.
+    """
+    if not os.path.exists(filename):
+        return {}
+    translations = {}
+    # Read bytes so a line cut off inside a multi-byte character fails json.loads (and is
+    # skipped) instead of raising while the file is being decoded
+    with open(filename, "rb") as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return {}
+        if header != {'language': target_language, 'tone': tone}:
+            return {}
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partially written line from an interrupted run
+            chap_id, para_id = record['chap'], record['para']
+            if chap_id >= len(chapters):
+                continue
+            index, paragraphs = chapters[chap_id]
+            if para_id is None:
+                original = index
+            else:
+                original = paragraphs[para_id] if para_id < len(paragraphs) else None
+            if record['original'] == original:
+                translations[(chap_id, para_id)] = record['translated']
+    return translations
+
+
+def save_dict_to_json(data, filename="book.json", indent=None):
+    """
+    Saves a dictionary or list (like the parsed chapters) to a JSON file.
+    Output is compact unless an indent is given.
+    """
+    try:
+        write_json_file(data, filename, indent)
         print(f"✅ Data saved to {filename}")
     except Exception as e:
         print(f"❌ Error saving data to JSON: {e}")
 
-def save_book_to_json(book_obj, filename="structured_book.json"):
+def save_book_to_json(book_obj, filename="structured_book.json", indent=None):
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump({'title': book_obj.title, 'content': book_obj.content}, f, ensure_ascii=False, indent=2)
+        write_json_file({'title': book_obj.title, 'content': book_obj.content}, filename, indent)
         print(f"✅ Full Book JSON saved to {filename}")
     except Exception as e:
         print(f"❌ Error saving full book JSON: {e}")
 
-def main():
+async def translate_paragraph_group(model, texts, label, semaphore, limiter):
+    """
+    Translates a group of paragraphs, packed into one request when there is more than one.
+    Falls back to one request per paragraph if the packed request keeps failing (a single
+    problematic paragraph shouldn't fail the whole group) or its response can't be matched up.
+    Returns a list with the translation, or the exception, for each paragraph.
+    """
+    if len(texts) > 1:
+        try:
+            translations = await translate_with_retries(
+                translate_packed_blocks, model, texts, label, semaphore, limiter)
+        except ValueError:
+            translations = None
+        if translations is not None:
+            return translations
+        print(f"    Could not translate {label} together. Translating them one by one...")
+    tasks = [
+        translate_with_retries(translate_block, model, text, f"one of {label}", semaphore, limiter)
+        for text in texts
+    ]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def group_member(group_task, position):
+    """Awaits a translate_paragraph_group task and returns (or raises) one paragraph's result."""
+    result = (await group_task)[position]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+async def cache_translation(translation, cache, text, kind="paragraph"):
+    """Awaits a pending translation of text and stores it in the cache as soon as it succeeds."""
+    translated_text = await translation
+    cache.put(text, translated_text, kind=kind)
+    return translated_text
+
+
+async def checkpoint_translation(translation, checkpoint_file, chap_id, para_ids, original_text):
+    """
+    Awaits a pending translation and appends a checkpoint record for each position in
+    the chapter that uses it (para_id None for the heading) as soon as it succeeds.
+    """
+    translated_text = await translation
+    write_checkpoint_records(checkpoint_file, chap_id, para_ids, original_text, translated_text)
+    return translated_text
+
+
+def write_lines(outputs):
+    """Writes each (file, lines) pair and flushes the file so the lines reach the disk."""
+    for output_file, lines in outputs:
+        output_file.writelines(lines)
+        output_file.flush()
+
+
+async def write_chapter_output(previous_write, outputs):
+    """
+    Writes a chapter's (file, lines) pairs in a worker thread so the event loop keeps
+    dispatching translation requests meanwhile. Waits for the previous chapter's write
+    first, which keeps every file in chapter order.
+    """
+    if previous_write is not None:
+        await previous_write
+    await asyncio.to_thread(write_lines, outputs)
+
+
+async def translate_chapter(model, chap_id, index, paragraphs, cache, known_translations, in_flight,
+                            checkpoint_file, semaphore, limiter):
+    """
+    Translates a chapter heading and all of its paragraphs concurrently.
+    Text found in 'known_translations' (loaded from the checkpoint, keyed by
+    (chapter_idx, paragraph_idx) with paragraph_idx None for the heading) or in the cache
+    is not requested again, and 'in_flight' (shared by all chapters, keyed by
+    ("heading" or "paragraph", text)) makes identical headings or paragraphs anywhere in the
+    book share a single request. The remaining paragraphs are packed several to a request,
+    and each new translation is cached as soon as its own request completes. Every
+    translation not already in the checkpoint is appended to 'checkpoint_file' once known.
+    Returns the translated heading and the list of paragraph translations in order,
+    with None for anything that could not be translated.
+    """
+    heading_tasks = []
+    translated_heading = known_translations.get((chap_id, None))
+    if translated_heading is None:
+        translated_heading = cache.get(index, kind="heading")
+        if translated_heading is not None:
+            write_checkpoint_records(checkpoint_file, chap_id, [None], index, translated_heading)
+    if translated_heading is None:
+        heading_key = ("heading", index)
+        if heading_key not in in_flight:
+            print(f"\n  Translating heading: '{index}'...")
+            heading_translation = translate_with_retries(
+                translate_heading, model, index, f"heading '{index}'", semaphore, limiter)
+            in_flight[heading_key] = asyncio.ensure_future(
+                cache_translation(heading_translation, cache, index, kind="heading"))
+        heading_tasks.append(
+            checkpoint_translation(in_flight[heading_key], checkpoint_file, chap_id, [None], index))
+
+    translations = []
+    missing = {}
+    for num, block in enumerate(paragraphs):
+        translation = known_translations.get((chap_id, num))
+        if translation is None:
+            translation = cache.get(block)  # Includes paragraphs translated by a batch job
+            if translation is None:
+                missing.setdefault(block, []).append(num)
+            else:
+                write_checkpoint_records(checkpoint_file, chap_id, [num], block, translation)
+        translations.append(translation)
+    print(f"  Translating {len(missing)} paragraphs of '{index}'...")
+    new_blocks = [block for block in missing if ("paragraph", block) not in in_flight]
+    for group in pack_paragraphs(new_blocks):
+        first, last = missing[group[0]][0] + 1, missing[group[-1]][0] + 1
+        label = f"paragraph {first} of '{index}'" if len(group) == 1 else f"paragraphs {first}-{last} of '{index}'"
+        group_task = asyncio.ensure_future(translate_paragraph_group(model, group, label, semaphore, limiter))
+        for position, block in enumerate(group):
+            in_flight[("paragraph", block)] = asyncio.ensure_future(
+                cache_translation(group_member(group_task, position), cache, block))
+    tasks = [checkpoint_translation(in_flight[("paragraph", block)], checkpoint_file, chap_id, nums, block)
+             for block, nums in missing.items()]
+    results = await asyncio.gather(*heading_tasks, *tasks, return_exceptions=True)
+
+    if heading_tasks:
+        translated_heading, results = results[0], results[1:]
+        if isinstance(translated_heading, Exception):
+            translated_heading = None
+
+    # Results come back in the same order as the missing paragraphs
+    for (block, nums), result in zip(missing.items(), results):
+        if isinstance(result, Exception):
+            result = None
+        for num in nums:
+            translations[num] = result
+    return translated_heading, translations
+
+
+async def main():
     # --- Interactive Input for Configuration ---
     input_txt_filename = input("Enter the path to the input text file (e.g., 'book.txt'): ").strip()
     if not os.path.exists(input_txt_filename):
@@ -197,6 +784,9 @@ def main():
     full_output_text_filename = os.path.join(output_dir, f"{base_filename_without_ext}_full.txt")
     parsed_json_filename = os.path.join(output_dir, f"{base_filename_without_ext}_parsed.json")
     structured_book_json_filename = os.path.join(output_dir, f"{base_filename_without_ext}_structured_book.json")
+    batch_requests_filename = os.path.join(output_dir, f"{base_filename_without_ext}_batch_requests.jsonl")
+    cache_filename = os.path.join(output_dir, f"{base_filename_without_ext}_cache.sqlite")
+    checkpoint_filename = os.path.join(output_dir, f"{base_filename_without_ext}_checkpoint.jsonl")
 
 
     # --- API Key Validation ---
@@ -209,87 +799,116 @@ def main():
     language = input("Please enter the target language to translate into (e.g., 'English', 'Hindi', 'Telugu'): ").strip()
     tone = input("How do you prefer the choice of words (e.g., 'simple', 'formal', 'conversational'): ").strip()
     print(f" Translation settings: Language = '{language}', Tone = '{tone}'")
+    use_batch = input("Use the Gemini Batch API for paragraphs? Cheaper, but jobs can take hours (y/N): ").strip().lower() == "y"
 
-    # --- Parse Input Text File into Original Dictionary Format ---
-    print(f"\nProcessing '{input_txt_filename}' into dictionary format...")
-    dictionary_format = convert_txt_to_dict(input_txt_filename)
-    indexes = list(dictionary_format.keys())  # These are your chapter/section titles
-    print(f"Found sections: {indexes}")
-    save_dict_to_json(dictionary_format, parsed_json_filename)  # Save the original dictionary
+    # --- Parse Input Text File into Ordered Chapters ---
+    print(f"\nProcessing '{input_txt_filename}' into chapters...")
+    chapters = convert_txt_to_dict(input_txt_filename)
+    print(f"Found sections: {[index for index, _ in chapters]}")
+    # Save the original text in the same chapter layout as the structured book
+    save_dict_to_json([{'title': index, 'paragraphs': paragraphs} for index, paragraphs in chapters],
+                      parsed_json_filename)
 
     # --- Set Up Gemini Model (now with system instructions) ---
     model = setup_gemini(secret_key, language, tone)
 
+    # --- Open the translation cache so repeated paragraphs are never re-translated ---
+    cache = TranslationCache(cache_filename, language, tone)
+
+    # --- Resume from the checkpoint of an earlier, interrupted run if there is one ---
+    known_translations = load_checkpoint(checkpoint_filename, chapters, language, tone)
+    resume = bool(known_translations)  # Otherwise the checkpoint is started over for this language and tone
+    if resume:
+        print(f"Resuming: {len(known_translations)} translations loaded from '{checkpoint_filename}'.")
+
+    # Thread pool for blocking work: the batch job, file writes, and requests when the SDK
+    # has no async API (see generate_content)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS))
+
+    # --- Optionally translate all remaining paragraphs up-front with a single Batch API job ---
+    if use_batch:
+        # One request per distinct uncached text; the cache then fans each result out to every
+        # paragraph with that text, just like a shared regular request
+        pending = {}
+        for chap_id, para_id, text in flatten_book_blocks(chapters):
+            if (chap_id, para_id) not in known_translations and text not in pending and cache.get(text) is None:
+                pending[text] = (chap_id, para_id, text)
+        blocks = list(pending.values())
+        batch_translations = await translate_blocks_with_batch(
+            secret_key, build_system_instruction(language, tone), blocks, batch_requests_filename) or {}
+        # Batch results go through the cache, so each chapter picks them up and checkpoints them
+        for chap_id, para_id, text in blocks:
+            if (chap_id, para_id) in batch_translations:
+                cache.put(text, batch_translations[(chap_id, para_id)])
+
     # --- Initialize the Book Object (Single Class) ---
     book_title = os.path.splitext(os.path.basename(input_txt_filename))[0].replace("_", " ").title()
     book_object = Book(title=f"Translated {book_title}") # Initial title is just based on original filename
 
     # --- Perform Translation, Write Files, and Populate Book Object ---
     print("\nStarting translation process...")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limiter = RateLimiter(REQUESTS_PER_MINUTE, 60)
+    chapter_tasks = []
+    in_flight = {}  # (kind, text) -> pending translation, shared across chapters
     try:
-        # Open output files once before the loop for efficiency
-        with open(translated_output_text_filename, "w", encoding="utf-8") as translated_file, \
-                open(full_output_text_filename, "w", encoding="utf-8") as full_file:
-
-            for index in indexes:
-                # --- Translate the index (chapter/section title) ---
-                translated_heading = ""
-                retries = 0
-                max_retries = 5
-                print(f"\n  Translating heading: '{index}'...")
-                while retries < max_retries:
-                    try:
-                        translated_heading = translate_heading(model, index)
-                        break
-                    except ValueError:
-                        print(f"    Failed to translate heading '{index}'. Retrying ({retries + 1}/{max_retries})...")
-                        retries += 1
-                        time.sleep(2)
-                else:
-                    print(f"❌ Giving up on heading '{index}' after {max_retries} attempts.")
-                    translated_heading = f"[Translation Failed for: {index}]"
-
-                # Use the translated heading for display and file writing
-                print(f"--- Original: '{index}' --- Translated: '{translated_heading}' ---")
-
-                # Write headings to files
-                translated_file.write(f"\n\n{translated_heading.upper()}\n\n\n") # Often headings are uppercase
-                full_file.write(f"\n\n{index.upper()}\n\n\n") # Original heading
-                full_file.write(f"{translated_heading.upper()}\n\n\n") # Translated heading
-
-                # Add a new chapter to the book object with the translated title
-                # IMPORTANT: Storing the translated title in the Book object for JSON export
-                book_object.add_chapter(translated_heading)
-
-                num = 0
-                for block in dictionary_format[index]:
-                    print(f"  Translating paragraph {num + 1} of '{index}'...")
-
-                    translation = ""
-                    retries = 0
-                    while retries < max_retries:
-                        try:
-                            translation = translate_block(model, block)
-                            break  # Break out of retry loop if successful
-                        except ValueError:
-                            print(
-                                f"    Failed to translate paragraph {num + 1} of '{index}'. Retrying ({retries + 1}/{max_retries})...")
-                            retries += 1
-                            time.sleep(2)  # Longer sleep before retrying API call
-                    else:  # This block executes if the while loop completes without a 'break'
-                        print(f"❌ Giving up on paragraph {num + 1} of '{index}' after {max_retries} attempts.")
-                        translation = "[Translation Failed]"  # Placeholder for failed translations
-
-                    # Add the original and translated text to the book object
-                    book_object.add_paragraph_to_last_chapter(original_text=block, translated_text=translation)
-
-                    # Write to files as per original request
-                    translated_file.write(f":\n{translation}\n") # Use translated heading
-                    full_file.write(f"(Original):\n\n{block}\n\n\n")
-                    full_file.write(f"(Translated):\n\n{translation}\n\n\n") # Use translated heading
-
-                    num += 1
-                    time.sleep(1.5)  # Pause between successful API calls to respect rate limits
+        # Open output files once before the loop, with large buffers since text is written per chapter
+        with open(translated_output_text_filename, "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as translated_file, \
+                open(full_output_text_filename, "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as full_file, \
+                open_checkpoint(checkpoint_filename, language, tone, resume) as checkpoint_file:
+
+            # Every chapter is scheduled up-front; the shared semaphore keeps requests bounded
+            # and serves them roughly in submission order, so earlier chapters finish first
+            chapter_tasks = [
+                asyncio.create_task(translate_chapter(
+                    model, chap_id, index, paragraphs, cache, known_translations, in_flight,
+                    checkpoint_file, semaphore, limiter))
+                for chap_id, (index, paragraphs) in enumerate(chapters)
+            ]
+
+            # Write chapters to files in their original order as they complete. Each chapter's
+            # output is written in a worker thread while the next chapters keep translating
+            write_task = None
+            try:
+                for (index, paragraphs), chapter_task in zip(chapters, chapter_tasks):
+                    translated_heading, translations = await chapter_task
+
+                    if translated_heading is None:
+                        translated_heading = f"[Translation Failed for: {index}]"
+
+                    # Use the translated heading for display and file writing
+                    print(f"--- Original: '{index}' --- Translated: '{translated_heading}' ---")
+
+                    # Collect the chapter's output and write it to each file in one call
+                    translated_lines = [f"\n\n{translated_heading.upper()}\n\n\n"] # Often headings are uppercase
+                    full_lines = [f"\n\n{index.upper()}\n\n\n", # Original heading
+                                  f"{translated_heading.upper()}\n\n\n"] # Translated heading
+
+                    # Add a new chapter to the book object with the translated title
+                    # IMPORTANT: Storing the translated title in the Book object for JSON export
+                    book_object.add_chapter(translated_heading)
+
+                    for block, translation in zip(paragraphs, translations):
+                        if translation is None:
+                            translation = "[Translation Failed]"  # Placeholder for failed translations
+
+                        # Add the original and translated text to the book object
+                        book_object.add_paragraph_to_last_chapter(original_text=block, translated_text=translation)
+
+                        translated_lines.append(f":\n{translation}\n")
+                        full_lines.append(f"(Original):\n\n{block}\n\n\n")
+                        full_lines.append(f"(Translated):\n\n{translation}\n\n\n")
+
+                    write_task = asyncio.create_task(write_chapter_output(write_task, [
+                        (translated_file, translated_lines),
+                        (full_file, full_lines),
+                    ]))
+                if write_task is not None:
+                    await write_task
+            finally:
+                # The files are closed when this block exits, so let any pending write finish first
+                if write_task is not None:
+                    await asyncio.wait([write_task])
 
         print(
             f"\n✅ Translation complete! Output saved to '{translated_output_text_filename}' and '{full_output_text_filename}'.")
@@ -298,9 +917,13 @@ def main():
         print(f"An unexpected error occurred during the translation process: {e}")
         print("Please check your input file, network connection, or API key.")
         return None  # Return None if an error occurs
-    save_book_to_json(book_object, structured_book_json_filename)
+    finally:
+        for task in chapter_tasks + list(in_flight.values()):
+            task.cancel()  # No-op for finished tasks; stops the rest after an error
+        cache.close()
+    await asyncio.to_thread(save_book_to_json, book_object, structured_book_json_filename)
     return book_object  # Return the fully populated Book object at the end
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
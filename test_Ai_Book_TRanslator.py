@@ -1,10 +1,22 @@
 import pytest
+import asyncio
+import json
 import tempfile
 import os
-from unittest.mock import MagicMock, patch
-from project import convert_txt_to_dict, check_api_key, translate_block
+from unittest.mock import AsyncMock, MagicMock, patch
+import project
+from project import convert_txt_to_dict, check_api_key, translate_block, parse_batch_results, TranslationCache
+from project import backoff_delay, RETRY_MIN_WAIT, RETRY_MAX_WAIT, pack_paragraphs, translate_packed_blocks
+from project import checkpoint_record, open_checkpoint, load_checkpoint, Book, save_book_to_json
+from project import translate_blocks_with_batch
 
 
+@pytest.fixture(autouse=True)
+def reset_gemini_state(monkeypatch):
+    # check_api_key/setup_gemini remember the configured key and test model between calls
+    monkeypatch.setattr(project, "_configured_key", None)
+    monkeypatch.setattr(project, "_test_model", None)
+
 
 # 1. Test convert_txt_to_dict()
 
@@ -17,10 +29,11 @@ def test_convert_txt_to_dict_basic():
 
     result = convert_txt_to_dict(tmp_filename)
 
-    assert "Intro" in result
-    assert "Chapter One" in result
-    assert result["Intro"] == ["This is the first paragraph.", "This is the second paragraph."]
-    assert result["Chapter One"] == ["Another paragraph."]
+    assert result == [
+        ("summary", []),
+        ("Intro", ["This is the first paragraph.", "This is the second paragraph."]),
+        ("Chapter One", ["Another paragraph."]),
+    ]
 
     os.remove(tmp_filename)  # cleanup
 
@@ -45,21 +58,243 @@ def test_check_api_key_invalid(mock_genai):
     assert result is True  # means key is invalid
 
 
+@patch("project.genai")
+def test_check_api_key_configures_once_per_key(mock_genai):
+    mock_genai.GenerativeModel.return_value.generate_content.return_value.text = "Hello!"
+
+    assert check_api_key("fake_api_key") is False
+    assert check_api_key("fake_api_key") is False
+    assert mock_genai.configure.call_count == 1
+    assert mock_genai.GenerativeModel.call_count == 1
+
+    assert check_api_key("other_key") is False
+    assert mock_genai.configure.call_count == 2
+    assert mock_genai.GenerativeModel.call_count == 2
+
+
 
 # 3. Test translate_block() with mocking
 
 def test_translate_block_success():
     mock_model = MagicMock()
-    mock_model.generate_content.return_value.text = "Bonjour!"
+    mock_model.generate_content_async = AsyncMock()
+    mock_model.generate_content_async.return_value.text = "Bonjour!"
     text = "Hello!"
-    result = translate_block(mock_model, text)
+    result = asyncio.run(translate_block(mock_model, text))
     assert isinstance(result, str)
     assert "Bonjour" in result
 
 
 def test_translate_block_failure():
     mock_model = MagicMock()
-    mock_model.generate_content.side_effect = Exception("Network error")
+    mock_model.generate_content_async = AsyncMock(side_effect=Exception("Network error"))
 
     with pytest.raises(ValueError):
-        translate_block(mock_model, "Hello!")
+        asyncio.run(translate_block(mock_model, "Hello!"))
+
+
+
+# 4. Test parse_batch_results()
+
+def test_parse_batch_results_maps_keys_and_skips_errors():
+    output = (
+        '{"key": "0-0", "response": {"candidates": [{"content": {"parts": [{"text": "Bonjour "}]}}]}}\n'
+        '{"key": "1-2", "error": {"code": 429, "message": "Resource exhausted"}}\n'
+        '\n'
+        '{"key": "1-3", "response": {"candidates": [{"content": {"parts": [{"text": "Salut"}, {"text": " !"}]}}]}}\n'
+    )
+    result = parse_batch_results(output)
+    assert result == {(0, 0): "Bonjour", (1, 3): "Salut !"}
+
+
+
+# 5. Test TranslationCache
+
+def test_translation_cache_persists_per_language_and_tone(tmp_path):
+    cache_file = str(tmp_path / "cache.sqlite")
+    cache = TranslationCache(cache_file, "French", "formal")
+    assert cache.get("Hello!") is None
+    cache.put("Hello!", "Bonjour !")
+    cache.close()
+
+    reopened = TranslationCache(cache_file, "French", "formal")
+    assert reopened.get("Hello!") == "Bonjour !"
+    reopened.close()
+
+    other_language = TranslationCache(cache_file, "Hindi", "formal")
+    assert other_language.get("Hello!") is None
+    other_language.close()
+
+
+def test_translation_cache_keeps_headings_and_paragraphs_apart(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"), "French", "formal")
+    cache.put("Summary", "Résumé", kind="heading")
+    assert cache.get("Summary", kind="heading") == "Résumé"
+    assert cache.get("Summary") is None
+    cache.close()
+
+
+
+# 6. Test backoff_delay()
+
+def test_backoff_delay_stays_within_bounds():
+    for attempt in range(1, 10):
+        delay = backoff_delay(attempt)
+        assert RETRY_MIN_WAIT <= delay <= min(RETRY_MAX_WAIT, RETRY_MIN_WAIT * 2 ** attempt)
+
+
+
+# 7. Test paragraph packing
+
+def test_pack_paragraphs_respects_limits():
+    groups = pack_paragraphs(["a" * 10, "b" * 10, "c" * 10, "d" * 50, "e"], max_chars=25, max_count=2)
+    assert groups == [["a" * 10, "b" * 10], ["c" * 10], ["d" * 50], ["e"]]
+
+
+def test_translate_packed_blocks_parses_numbered_response():
+    mock_model = MagicMock()
+    mock_model.generate_content_async = AsyncMock()
+    mock_model.generate_content_async.return_value.text = "[1] Bonjour.\n\n[2] Ligne un\nligne deux."
+    result = asyncio.run(translate_packed_blocks(mock_model, ["Hello.", "Line one\nline two."]))
+    assert result == ["Bonjour.", "Ligne un\nligne deux."]
+
+
+def test_translate_packed_blocks_returns_none_on_count_mismatch():
+    mock_model = MagicMock()
+    mock_model.generate_content_async = AsyncMock()
+    mock_model.generate_content_async.return_value.text = "[1] Bonjour. Ligne un."
+    assert asyncio.run(translate_packed_blocks(mock_model, ["Hello.", "Line one."])) is None
+
+
+
+# 8. Test checkpoint round trip
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint_file = str(tmp_path / "book_checkpoint.jsonl")
+    chapters = [("Intro", ["Hello!", "Goodbye!"])]
+
+    with open_checkpoint(checkpoint_file, "French", "formal", resume=False) as f:
+        f.write(checkpoint_record(0, None, "Intro", "Introduction"))
+        f.write(checkpoint_record(0, 1, "Goodbye!", "Au revoir !"))
+        f.write('{"chap": 0, "para": 0, "orig')  # Interrupted mid-write
+
+    assert load_checkpoint(checkpoint_file, chapters, "French", "formal") == {
+        (0, None): "Introduction",
+        (0, 1): "Au revoir !",
+    }
+    assert load_checkpoint(checkpoint_file, chapters, "Hindi", "formal") == {}
+    assert load_checkpoint(checkpoint_file, [("Intro", ["Hello!", "Bye!"])], "French", "formal") == {
+        (0, None): "Introduction",
+    }
+
+    # A resumed run appends after the torn line without losing its first record
+    with open_checkpoint(checkpoint_file, "French", "formal", resume=True) as f:
+        f.write(checkpoint_record(0, 0, "Hello!", "Bonjour !"))
+
+    assert load_checkpoint(checkpoint_file, chapters, "French", "formal") == {
+        (0, None): "Introduction",
+        (0, 0): "Bonjour !",
+        (0, 1): "Au revoir !",
+    }
+
+    # A line cut off inside a multi-byte character is skipped the same way
+    with open(checkpoint_file, "ab") as f:
+        f.write(checkpoint_record(0, 0, "Hello!", "नमस्ते").encode("utf-8")[:-7])
+
+    assert load_checkpoint(checkpoint_file, chapters, "French", "formal") == {
+        (0, None): "Introduction",
+        (0, 0): "Bonjour !",
+        (0, 1): "Au revoir !",
+    }
+
+
+
+# 9. Test Book JSON export with Paragraph objects
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_save_book_to_json_exports_paragraphs(tmp_path, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(project, "orjson", None)
+    elif project.orjson is None:
+        pytest.skip("orjson is not installed")
+    book = Book(title="Translated Test")
+    book.add_chapter("Introduction")
+    book.add_paragraph_to_last_chapter(original_text="Hello!", translated_text="Bonjour !")
+
+    filename = str(tmp_path / "book.json")
+    save_book_to_json(book, filename)
+
+    with open(filename, encoding="utf-8") as f:
+        assert json.load(f) == {
+            "title": "Translated Test",
+            "content": [{"title": "Introduction", "paragraphs": [{"original": "Hello!", "translated": "Bonjour !"}]}],
+        }
+
+
+
+# 10. Test a batch-mode run followed by a resumed run
+
+def run_main(monkeypatch, answers, model):
+    answers = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    monkeypatch.setattr(project.getpass, "getpass", lambda prompt: "test-key")
+    monkeypatch.setattr(project.genai, "configure", MagicMock())
+    monkeypatch.setattr(project.genai, "GenerativeModel", MagicMock(return_value=model))
+    monkeypatch.setattr(project, "_configured_key", None)
+    monkeypatch.setattr(project, "_test_model", None)
+    return asyncio.run(project.main())
+
+
+def test_batch_run_then_resume_from_checkpoint(tmp_path, monkeypatch):
+    book_file = tmp_path / "book.txt"
+    book_file.write_text("{-Intro-}\n\nHello!\n\nGoodbye!\n\nHello!", encoding="utf-8")
+    checkpoint_file = str(tmp_path / "book_checkpoint.jsonl")
+    # A checkpoint left behind by a run in another language must not be appended to
+    with open_checkpoint(checkpoint_file, "Hindi", "formal", resume=False) as f:
+        f.write(checkpoint_record(1, 0, "Hello!", "नमस्ते"))
+
+    def download(file):
+        with open(tmp_path / "book_batch_requests.jsonl", encoding="utf-8") as f:
+            keys = [json.loads(line)["key"] for line in f]
+        return "\n".join(json.dumps({"key": key, "response": {"candidates": [{"content": {"parts": [
+            {"text": f"Batch {key}"}]}}]}}) for key in keys).encode("utf-8")
+
+    client = MagicMock()
+    client.batches.create.return_value.state.name = "JOB_STATE_SUCCEEDED"
+    client.batches.create.return_value.dest.file_name = "files/output"
+    client.files.download.side_effect = download
+    monkeypatch.setattr(project, "batch_genai", MagicMock())
+    project.batch_genai.Client.return_value = client
+
+    model = MagicMock()
+    model.generate_content_async = AsyncMock()
+    model.generate_content_async.return_value.text = "Titre"
+    run_main(monkeypatch, [str(book_file), "French", "formal", "y"], model)
+
+    # The repeated paragraph is submitted once and its translation reused
+    with open(tmp_path / "book_batch_requests.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["key"] for line in f] == ["1-0", "1-1"]
+    chapters = convert_txt_to_dict(str(book_file))
+    assert load_checkpoint(checkpoint_file, chapters, "French", "formal") == {
+        (0, None): "Titre",
+        (1, None): "Titre",
+        (1, 0): "Batch 1-0",
+        (1, 1): "Batch 1-1",
+        (1, 2): "Batch 1-0",
+    }
+
+    # Nothing is left to translate, so a second batch run must not submit a job
+    client.reset_mock()
+    assert asyncio.run(translate_blocks_with_batch("test-key", "Respond concisely.", [], "unused.jsonl")) == {}
+    client.files.upload.assert_not_called()
+    client.batches.create.assert_not_called()
+
+    # Without the cache, the resumed run must take everything from the checkpoint
+    os.remove(tmp_path / "book_cache.sqlite")
+    resumed_model = MagicMock()
+    resumed_model.generate_content_async = AsyncMock(side_effect=Exception("Network error"))
+    book = run_main(monkeypatch, [str(book_file), "French", "formal", "n"], resumed_model)
+
+    resumed_model.generate_content_async.assert_not_called()
+    assert [paragraph.translated for paragraph in book.content[1]['paragraphs']] == [
+        "Batch 1-0", "Batch 1-1", "Batch 1-0"]